@@ -1,28 +1,39 @@
 import os
 import gc
+import atexit
 import re
 import uuid
 import time
 import json
+import logging
+import math
 import queue
+import socket
 import subprocess
+import tempfile
+from logging.handlers import QueueHandler, QueueListener
 from pathlib import Path
-from threading import Thread
+from threading import Thread, Lock, Event, Condition, BoundedSemaphore, Timer
 from datetime import datetime, timedelta
 
-from functools import wraps
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps, lru_cache
+from operator import itemgetter
 
 from flask import (
     Flask,
+    Request,
     request,
     render_template,
-    send_from_directory,
+    send_file,
     redirect,
     url_for,
     flash,
     jsonify,
     session,
     abort,
+    stream_with_context,
 )
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import (
@@ -33,9 +44,11 @@ from flask_login import (
     login_required,
     current_user,
 )
+import orjson
 from werkzeug.security import generate_password_hash, check_password_hash
 from werkzeug.utils import secure_filename
-from sqlalchemy import text
+from sqlalchemy import text, update, select, delete, event
+from sqlalchemy.engine import Engine
 
 # ML libraries are imported lazily to speed up startup
 torch = None
@@ -44,16 +57,34 @@ Pipeline = None
 detect = None
 DetectorFactory = None
 genai = None
-AudioSegment = None
+_ML_LOADED = False
+_ML_IMPORT_LOCK = Lock()
 
 def load_ml_libraries():
     """Lazy load ML libraries when needed for processing."""
-    global torch, whisperx, Pipeline, detect, DetectorFactory, genai, AudioSegment, DEVICE_STR, DEVICE
+    # Called from every chunk helper; after the first load this is one global read
+    if _ML_LOADED:
+        return
+    with _ML_IMPORT_LOCK:
+        _import_ml_libraries()
+
+
+def _import_ml_libraries():
+    global torch, whisperx, Pipeline, detect, DetectorFactory, genai, CUDA_AVAILABLE, DEVICE_STR, DEVICE
+    global _ML_LOADED
     if torch is None:
+        # Chunk lengths vary a little from job to job; expandable segments let the
+        # caching allocator grow blocks instead of fragmenting into OOMs.
+        # Must be set before torch initializes CUDA.
+        os.environ.setdefault("PYTORCH_CUDA_ALLOC_CONF", "expandable_segments:True")
         import torch as _torch
         torch = _torch
-        DEVICE_STR = "cuda" if torch.cuda.is_available() else "cpu"
+        CUDA_AVAILABLE = torch.cuda.is_available()
+        DEVICE_STR = "cuda" if CUDA_AVAILABLE else "cpu"
         DEVICE = torch.device(DEVICE_STR)
+        # Chunk lengths are nearly constant, so let cuDNN pick the fastest kernels once
+        torch.backends.cudnn.benchmark = True
+        torch.set_float32_matmul_precision("high")
     if whisperx is None:
         import whisperx as _whisperx
         whisperx = _whisperx
@@ -68,34 +99,80 @@ def load_ml_libraries():
     if genai is None:
         import google.generativeai as _genai
         genai = _genai
-    if AudioSegment is None:
-        from pydub import AudioSegment as _AudioSegment
-        AudioSegment = _AudioSegment
+    _ML_LOADED = True
 
 # ---------- GLOBAL CONFIG ---------- #
 
+CUDA_AVAILABLE = False  # Checked once when ML libraries are loaded
 DEVICE_STR = "cpu"  # Will be updated when ML libraries are loaded
 DEVICE = None
 
 BASE_DIR = Path(__file__).parent
 UPLOAD_DIR = BASE_DIR / "uploads"
 OUTPUT_DIR = BASE_DIR / "outputs"
+# Chunks are no longer written to disk. The path is kept only so cleanup can
+# remove chunk dirs left by older versions, so it isn't created.
 CHUNKS_DIR = BASE_DIR / "chunks"
 
 UPLOAD_DIR.mkdir(exist_ok=True)
 OUTPUT_DIR.mkdir(exist_ok=True)
-CHUNKS_DIR.mkdir(exist_ok=True)
 
-CHUNK_LENGTH_MS = 60 * 1000  # 1 minute chunks
+# WhisperX VAD-splits each chunk into <=30 s windows and batches those, so a chunk
+# needs to be several minutes long for a batch to fill up on the GPU.
+CHUNK_LENGTH_MS = 5 * 60 * 1000  # 5 minute chunks
+WHISPER_BATCH_SIZE = 16
+# Empty means pick per device (see whisper_compute_type); set to override.
+WHISPER_COMPUTE_TYPE = os.environ.get("WHISPER_COMPUTE_TYPE", "")
+# Load WhisperX when the queue worker starts rather than on the first job.
+# Only the one process running the queue worker loads the models.
+PRELOAD_WHISPER_MODEL = os.environ.get("PRELOAD_WHISPER_MODEL", "0") == "1"
 ADMIN_EMAIL = "admin@unlv.edu"
 
-job_queue = queue.Queue()
+# The jobs table is the queue: the worker claims the oldest queued row.
+# _job_available wakes it as soon as a job is queued in its own process; jobs
+# queued by other processes are noticed within QUEUE_POLL_SECONDS.
+QUEUE_POLL_SECONDS = 2
+# Only the process holding this lock runs the queue worker and cleanup scheduler,
+# so the models are loaded once per host however many gunicorn workers there are
+QUEUE_LOCK_PATH = BASE_DIR / "queue-worker.lock"
+_job_available = Event()
 cancelled_jobs = set()
+# Transcript/minutes generation for finished GPU stages (mostly waiting on Gemini)
+minutes_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="minutes")
+# File removal for deleted jobs, so delete requests return once the row is gone
+_cleanup_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="cleanup")
 AVG_JOB_DURATION_MINUTES = 15
 
+# Status streams (SSE): each open stream holds one server thread, so the cap
+# must stay below gunicorn's --threads (8) or streams starve normal requests
+SSE_MAX_STREAMS = 4
+SSE_STREAM_SECONDS = 300  # the browser reconnects after the stream ends
+SSE_POLL_SECONDS = 5
+_sse_slots = BoundedSemaphore(SSE_MAX_STREAMS)
+
+# A running job records the worker that claimed it, which refreshes its
+# heartbeat; a job whose heartbeat goes stale lost its worker and is failed
+JOB_HEARTBEAT_SECONDS = 30
+JOB_HEARTBEAT_TIMEOUT_SECONDS = 120
+_owned_jobs = set()  # running jobs claimed by this process
+
 # ---------- FLASK APP SETUP ---------- #
 
+UPLOAD_SPOOL_PREFIX = ".upload-"
+STALE_UPLOAD_SECONDS = 3600  # spooled uploads this old were abandoned mid-request
+
+
+class UploadRequest(Request):
+    """
+    Spool multipart uploads to a temp file inside UPLOAD_DIR, so save_upload()
+    can hard-link the finished file into place instead of copying it again.
+    """
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return tempfile.NamedTemporaryFile("wb+", dir=UPLOAD_DIR, prefix=UPLOAD_SPOOL_PREFIX)
+
+
 app = Flask(__name__)
+app.request_class = UploadRequest
 app.secret_key = os.environ.get("SECRET_KEY", "replace-with-a-secure-random-key-in-production")
 
 # Database configuration - use SQLite for local development
@@ -108,6 +185,22 @@ app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
 app.config["MAX_CONTENT_LENGTH"] = 100 * 1024 * 1024 * 1024  # 100GB max file size
 
 db = SQLAlchemy(app)
+
+if DATABASE_URL.startswith("sqlite"):
+    @event.listens_for(Engine, "connect")
+    def _sqlite_pragmas(dbapi_conn, _):
+        """
+        WAL lets the status/queue polls read while a worker is committing, and
+        synchronous=NORMAL is durable under WAL with one fsync per checkpoint
+        rather than two per commit.
+        """
+        cursor = dbapi_conn.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute("PRAGMA mmap_size=268435456")  # 256 MB
+        cursor.close()
+
+
 login_manager = LoginManager()
 login_manager.init_app(app)
 login_manager.login_view = "login"
@@ -136,6 +229,13 @@ class User(UserMixin, db.Model):
 
 class Job(db.Model):
     __tablename__ = "jobs"
+    # Queue position counts and the oldest-first queue listing are both range
+    # scans over queued jobs by creation time
+    __table_args__ = (
+        db.Index("ix_jobs_status_created_at", "status", "created_at"),
+        # Dashboard: a user's jobs, newest first
+        db.Index("ix_jobs_user_created", "user_id", db.text("created_at DESC")),
+    )
 
     id = db.Column(db.String(32), primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=True, index=True)
@@ -166,6 +266,14 @@ class Job(db.Model):
     # Audio info
     duration_seconds = db.Column(db.Float)
 
+    # API keys for the worker that claims the job; cleared once it is claimed
+    hf_token = db.Column(db.String(500), nullable=True)
+    gemini_key = db.Column(db.String(500), nullable=True)
+
+    # Claiming worker ("host:pid") and its last heartbeat while running
+    worker_id = db.Column(db.String(300), nullable=True)
+    heartbeat_at = db.Column(db.DateTime, nullable=True)
+
     def _get_queue_position(self):
         """Return 1-based position among queued jobs, or 0 if not queued."""
         if self.status != "queued":
@@ -229,56 +337,37 @@ def convert_to_wav(input_path: str, target_sample_rate: int = 16000) -> tuple:
     Convert any audio file to mono WAV using ffmpeg (streams file, no 4GB memory limit).
     Returns (wav_path, duration_seconds).
     """
-    wav_path = OUTPUT_DIR / (Path(input_path).stem + "_converted.wav")
+    import soundfile as sf
 
-    # Get duration via ffprobe
-    try:
-        probe = subprocess.run(
-            ["ffprobe", "-v", "error", "-show_entries", "format=duration",
-             "-of", "default=noprint_wrappers=1:nokey=1", input_path],
-            capture_output=True, text=True, timeout=60
-        )
-        duration_seconds = float(probe.stdout.strip()) if probe.stdout.strip() else 0.0
-    except Exception:
-        duration_seconds = 0.0
+    wav_path = OUTPUT_DIR / (Path(input_path).stem + "_converted.wav")
 
-    # Convert: mono, target sample rate, WAV format
+    # Convert: drop any video stream, mono, target sample rate, 16-bit PCM WAV
     result = subprocess.run(
-        ["ffmpeg", "-y", "-i", input_path,
-         "-ar", str(target_sample_rate), "-ac", "1", str(wav_path)],
+        ["ffmpeg", "-y", "-nostdin", "-v", "error", "-i", input_path,
+         "-vn", "-ar", str(target_sample_rate), "-ac", "1", "-c:a", "pcm_s16le",
+         str(wav_path)],
         capture_output=True, timeout=7200
     )
     if result.returncode != 0:
         raise RuntimeError(f"ffmpeg conversion failed: {result.stderr.decode()[-500:]}")
 
+    # Duration comes from the WAV header, no extra ffprobe process needed
+    duration_seconds = sf.info(str(wav_path)).duration
     return str(wav_path), duration_seconds
 
 
-def split_audio(audio_path, chunk_length_ms=60 * 1000):
+def iter_audio_chunks(audio_path, chunk_length_ms=CHUNK_LENGTH_MS):
     """
-    Split audio into chunks using ffmpeg (streams file, handles any size WAV).
-    Returns sorted list of chunk paths.
+    Read a mono WAV as consecutive float32 chunks without writing chunk files.
+    Only the chunk being handed out is held in memory.
+    Returns (chunk_count, iterator of numpy arrays).
     """
-    chunk_length_sec = int(chunk_length_ms / 1000)
-    base_name = Path(audio_path).stem
-    chunk_dir = CHUNKS_DIR / base_name
-    chunk_dir.mkdir(parents=True, exist_ok=True)
-
-    chunk_pattern = str(chunk_dir / "chunk_%d.wav")
-
-    result = subprocess.run(
-        ["ffmpeg", "-y", "-i", audio_path,
-         "-f", "segment", "-segment_time", str(chunk_length_sec),
-         "-c", "copy", chunk_pattern],
-        capture_output=True, timeout=7200
-    )
-    if result.returncode != 0:
-        raise RuntimeError(f"ffmpeg split failed: {result.stderr.decode()[-500:]}")
+    import soundfile as sf
 
-    # Collect and sort chunk files numerically
-    chunks = sorted(chunk_dir.glob("chunk_*.wav"),
-                    key=lambda p: int(p.stem.split("_")[1]))
-    return [str(c) for c in chunks]
+    info = sf.info(audio_path)
+    samples_per_chunk = int(info.samplerate * chunk_length_ms / 1000)
+    chunk_count = math.ceil(info.frames / samples_per_chunk)
+    return chunk_count, sf.blocks(audio_path, blocksize=samples_per_chunk, dtype="float32")
 
 
 # ---------- YOUTUBE DOWNLOAD ---------- #
@@ -315,132 +404,331 @@ def download_youtube_audio(youtube_url: str, job_id: str) -> str:
 
 # ---------- MODEL LOADING ---------- #
 
-def load_models(hf_token: str):
+# Models stay resident for the life of the process so each job does not pay
+# the load cost again. _MODEL_LOCK guards first-time initialization.
+_WHISPER_MODEL = None
+_DIARIZATION_PIPELINE = None
+_ALIGN_CACHE = {}  # language code -> (align_model, metadata), or why it has none
+_MODEL_LOCK = Lock()
+
+
+def whisper_compute_type() -> str:
     """
-    Load WhisperX and pyannote diarization models with user's HF token.
+    CTranslate2 compute type for WhisperX: int8 weights with fp16 activations on
+    Ampere+ (int8 tensor cores), plain float16 on older GPUs, int8 on CPU (where
+    float16 would silently run as float32).
     """
+    if WHISPER_COMPUTE_TYPE:
+        return WHISPER_COMPUTE_TYPE
+    if not CUDA_AVAILABLE:
+        return "int8"
+    major, _ = torch.cuda.get_device_capability()
+    return "int8_float16" if major >= 8 else "float16"
+
+
+def get_whisper_model():
+    """Return the WhisperX model, loading it on first use. It needs no token."""
+    global _WHISPER_MODEL
     load_ml_libraries()
-    whisper_model = whisperx.load_model("large-v2", device=DEVICE_STR, compute_type="float16")
+    with _MODEL_LOCK:
+        if _WHISPER_MODEL is None:
+            compute_type = whisper_compute_type()
+            print(f"Loading WhisperX large-v2 ({DEVICE_STR}, {compute_type})...", flush=True)
+            _WHISPER_MODEL = whisperx.load_model(
+                "large-v2", device=DEVICE_STR, compute_type=compute_type
+            )
+    return _WHISPER_MODEL
 
-    diarization_pipeline = Pipeline.from_pretrained(
-        "pyannote/speaker-diarization-3.0",
-        use_auth_token=hf_token
-    )
-    if diarization_pipeline is None:
-        raise ValueError("Failed to load diarization pipeline")
 
-    diarization_pipeline = diarization_pipeline.to(DEVICE)
-    return whisper_model, diarization_pipeline
+def get_models(hf_token: str):
+    """
+    Return the WhisperX and pyannote diarization models, loading them on first use
+    with the user's HF token.
+    """
+    global _DIARIZATION_PIPELINE
+    whisper_model = get_whisper_model()
+    with _MODEL_LOCK:
+        if _DIARIZATION_PIPELINE is None:
+            diarization_pipeline = Pipeline.from_pretrained(
+                "pyannote/speaker-diarization-3.0",
+                use_auth_token=hf_token
+            )
+            if diarization_pipeline is None:
+                raise ValueError("Failed to load diarization pipeline")
+            _DIARIZATION_PIPELINE = diarization_pipeline.to(DEVICE)
 
+    return whisper_model, _DIARIZATION_PIPELINE
 
-# ---------- CHUNK PROCESSING ---------- #
 
-def process_chunk(chunk_path, whisper_model, diarization_pipeline):
-    """Process a single audio chunk: transcribe, align, and diarize."""
+def get_align_model(language_code: str):
+    """
+    Return the (model, metadata) alignment pair for a language, loading it once.
+    A language whisperx has no alignment model for is remembered, so it isn't
+    retried on every chunk; any other failure (a download timeout, a full disk,
+    running out of GPU memory) is retried on the next chunk.
+    """
     load_ml_libraries()
-    print(f"Transcribing {chunk_path}...")
+    with _MODEL_LOCK:
+        cached = _ALIGN_CACHE.get(language_code)
+        if cached is None:
+            try:
+                cached = _ALIGN_CACHE[language_code] = whisperx.load_align_model(
+                    language_code=language_code,
+                    device=DEVICE
+                )
+            except Exception as e:
+                if isinstance(e, ValueError) and "No default align-model" in str(e):
+                    _ALIGN_CACHE[language_code] = e
+                cached = e
 
-    if torch.cuda.is_available():
-        torch.cuda.empty_cache()
+    if isinstance(cached, Exception):
+        raise RuntimeError(f"No alignment model for language '{language_code}': {cached}")
+    return cached
+
+
+# ---------- CHUNK PROCESSING ---------- #
+
+def run_with_oom_retry(fn, *args, **kwargs):
+    """
+    Call a model function under torch.inference_mode(), retrying once after
+    releasing cached CUDA memory if it runs out of memory. The caching allocator
+    is otherwise left alone.
+    """
+    try:
+        with torch.inference_mode():
+            return fn(*args, **kwargs)
+    except RuntimeError as e:
+        if "out of memory" not in str(e) or not CUDA_AVAILABLE:
+            raise
+        print(f"CUDA out of memory, freeing cache and retrying: {e}", flush=True)
         gc.collect()
+        torch.cuda.empty_cache()
+        with torch.inference_mode():
+            return fn(*args, **kwargs)
+
 
-    result = whisper_model.transcribe(
-        chunk_path,
+def transcribe_chunk(audio, whisper_model, label):
+    """Transcribe a single audio chunk (16 kHz float32 array). Returns the raw WhisperX result."""
+    load_ml_libraries()
+    print(f"Transcribing {label}...")
+
+    result = run_with_oom_retry(
+        whisper_model.transcribe,
+        audio,
         task="transcribe",
         language=None,
-        batch_size=8
+        batch_size=WHISPER_BATCH_SIZE
     )
+    print(f"Detected language: {result.get('language', 'unknown')}")
+    return result
+
 
+def align_chunk(audio, result, label):
+    """Align a chunk's transcription to word timings. Speakers are assigned later."""
+    load_ml_libraries()
     detected_language = result.get("language", "unknown")
-    print(f"Detected language: {detected_language}")
 
     if "segments" not in result or not result["segments"]:
-        print(f"Warning: No segments for {chunk_path}")
+        print(f"Warning: No segments for {label}")
         return []
 
-    # Alignment
     try:
-        if torch.cuda.is_available():
-            torch.cuda.empty_cache()
-            gc.collect()
-
-        model_a, metadata = whisperx.load_align_model(
-            language_code=detected_language,
-            device=DEVICE
+        model_a, metadata = get_align_model(detected_language)
+        if CUDA_AVAILABLE:
+            # whisperx.align copies each segment's slice of the waveform to the
+            # device; moving the whole chunk once makes those slices GPU views
+            audio = torch.from_numpy(audio).pin_memory().to(DEVICE, non_blocking=True)
+        aligned = run_with_oom_retry(
+            whisperx.align,
+            result["segments"], model_a, metadata, audio, device=DEVICE
         )
-        aligned = whisperx.align(
-            result["segments"], model_a, metadata, chunk_path, device=DEVICE
-        )
-        for seg in aligned["segments"]:
-            try:
-                seg["language"] = detect(seg["text"])
-            except Exception:
-                seg["language"] = detected_language
+        segments = aligned["segments"]
     except Exception as e:
-        print(f"Alignment error for {chunk_path}: {e}")
-        return result["segments"]
+        print(f"Alignment error for {label}: {e}")
+        segments = result["segments"]
 
-    # Diarization
-    try:
-        if torch.cuda.is_available():
-            torch.cuda.empty_cache()
-            gc.collect()
-
-        diarization = diarization_pipeline({"audio": chunk_path})
-        speakers = list(diarization.labels())
-        print(f"Detected {len(speakers)} speakers: {speakers}")
-
-        diarize_segments = []
-        for turn, _, speaker in diarization.itertracks(yield_label=True):
-            diarize_segments.append({
-                "segment": {"start": turn.start, "end": turn.end},
-                "speaker": speaker
-            })
-
-        if diarize_segments:
-            speaker_segments = []
-            for seg in aligned["segments"]:
-                seg_start = seg["start"]
-                seg_end = seg["end"]
-                matching_speakers = []
-
-                for d_seg in diarize_segments:
-                    d_start = d_seg["segment"]["start"]
-                    d_end = d_seg["segment"]["end"]
-                    if max(seg_start, d_start) < min(seg_end, d_end):
-                        matching_speakers.append(d_seg["speaker"])
-
-                seg["speaker"] = (
-                    max(set(matching_speakers), key=matching_speakers.count)
-                    if matching_speakers
-                    else "UNKNOWN"
-                )
-                speaker_segments.append(seg)
+    # WhisperX already detected the chunk's language; reuse it per segment so
+    # the transcript never has to run langdetect, aligned or not
+    for seg in segments:
+        seg["language"] = detected_language
+    return segments
 
-            return speaker_segments
-        else:
-            print("No diarization segments found")
-            return aligned["segments"]
 
-    except Exception as e:
-        print(f"Diarization error for {chunk_path}: {e}")
-        return aligned["segments"]
+def diarize_audio(audio_path, diarization_pipeline, hook=None):
+    """
+    Run speaker diarization over the whole recording so speaker labels are
+    consistent from start to finish. Returns a list of speaker turns. pyannote
+    calls hook between steps and batches; raising from it aborts the run.
+    """
+    load_ml_libraries()
+    diarization = run_with_oom_retry(diarization_pipeline, {"audio": audio_path}, hook=hook)
+    speakers = list(diarization.labels())
+    print(f"Detected {len(speakers)} speakers: {speakers}")
+
+    diarize_segments = []
+    for turn, _, speaker in diarization.itertracks(yield_label=True):
+        diarize_segments.append({
+            "segment": {"start": turn.start, "end": turn.end},
+            "speaker": speaker
+        })
+    return diarize_segments
+
+
+def assign_speakers(segments, diarize_segments):
+    """
+    Label each transcript segment with the speaker who talks longest during it.
+    Segments with no overlapping turn are labelled UNKNOWN.
+    """
+    import numpy as np
+
+    diarize_segments = sorted(diarize_segments, key=lambda d: d["segment"]["start"])
+    speakers = list(dict.fromkeys(d["speaker"] for d in diarize_segments))
+    speaker_ids = {speaker: n for n, speaker in enumerate(speakers)}
+
+    count = len(diarize_segments)
+    d_starts = np.fromiter((d["segment"]["start"] for d in diarize_segments), np.float64, count)
+    d_ends = np.fromiter((d["segment"]["end"] for d in diarize_segments), np.float64, count)
+    d_speakers = np.fromiter((speaker_ids[d["speaker"]] for d in diarize_segments), np.intp, count)
+    # Running max of end times is sorted, so binary search finds the first turn
+    # that could still be open when a segment starts
+    max_ends = np.maximum.accumulate(d_ends)
+
+    n_segs = len(segments)
+    seg_starts = np.fromiter((seg["start"] for seg in segments), np.float64, n_segs)
+    seg_ends = np.fromiter((seg["end"] for seg in segments), np.float64, n_segs)
+    lo = np.searchsorted(max_ends, seg_starts, side="right")
+    hi = np.searchsorted(d_starts, seg_ends, side="left")
+
+    # Expand every segment into its candidate turns lo..hi-1 as flat (segment, turn)
+    # pairs, so the overlaps for all segments are computed in one pass
+    counts = np.maximum(hi - lo, 0)
+    pair_seg = np.repeat(np.arange(n_segs), counts)
+    pair_turn = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts - lo, counts)
+
+    overlap = (np.minimum(seg_ends[pair_seg], d_ends[pair_turn])
+               - np.maximum(seg_starts[pair_seg], d_starts[pair_turn]))
+    np.maximum(overlap, 0.0, out=overlap)
+
+    # Per-segment speaking time for each speaker, as one flat (segment, speaker) grid
+    n_speakers = max(len(speakers), 1)
+    scores = np.bincount(
+        pair_seg * n_speakers + d_speakers[pair_turn],
+        weights=overlap,
+        minlength=n_segs * n_speakers,
+    ).reshape(n_segs, n_speakers)
+    best = scores.argmax(axis=1)
+    has_overlap = scores[np.arange(n_segs), best] > 0
+
+    for seg, speaker_id, found in zip(segments, best.tolist(), has_overlap.tolist()):
+        seg["speaker"] = speakers[speaker_id] if found else "UNKNOWN"
+    return segments
+
+
+# ---------- STAGE PIPELINE ---------- #
+
+# Chunks flow through one thread per stage (transcribe -> align) so chunk k+1 is
+# transcribed while chunk k is aligned; torch/CTranslate2 release the GIL while
+# they run on the GPU. Within a job each model is used by one thread (its stage,
+# or the diarization thread), and run_pipeline() joins them all before it
+# returns, so the next job never shares a model with a thread still running.
+_STAGE_DONE = object()
+STAGE_QUEUE_SIZE = 2
+
+
+def run_stage(fn, in_q, out_q, stop):
+    """
+    Apply fn to each item from in_q and pass the result on to out_q until the
+    _STAGE_DONE sentinel arrives. Exceptions are forwarded downstream as items.
+    Once stop is set the remaining items are drained without doing any work.
+    """
+    while True:
+        item = in_q.get()
+        if item is _STAGE_DONE:
+            out_q.put(_STAGE_DONE)
+            return
+        if isinstance(item, BaseException):
+            out_q.put(item)
+            continue
+        if stop.is_set():
+            continue
+        try:
+            out_q.put(fn(item))
+        except BaseException as e:
+            stop.set()
+            out_q.put(e)
+
+
+def start_stage_pipeline(items, stages, name):
+    """
+    Run items through a chain of stage functions, each on its own thread, with
+    bounded queues between them for backpressure. Returns (results_queue, stop,
+    threads); results arrive in order and end with _STAGE_DONE. After setting
+    stop, join the threads to wait for the item each stage is working on.
+    """
+    stop = Event()
+    queues = [queue.Queue(maxsize=STAGE_QUEUE_SIZE) for _ in stages]
+    queues.append(queue.Queue())
+
+    def _feed():
+        # Always end with _STAGE_DONE, even if reading items fails, so the
+        # stage threads (and anyone joining them) never wait forever
+        try:
+            for item in items:
+                if stop.is_set():
+                    break
+                queues[0].put(item)
+        except BaseException as e:
+            stop.set()
+            queues[0].put(e)
+        finally:
+            queues[0].put(_STAGE_DONE)
+
+    threads = [Thread(target=_feed, daemon=True, name=f"{name}-feed")]
+    for n, fn in enumerate(stages):
+        threads.append(Thread(
+            target=run_stage, args=(fn, queues[n], queues[n + 1], stop),
+            daemon=True, name=f"{name}-{fn.__name__}"
+        ))
+    for thread in threads:
+        thread.start()
+    return queues[-1], stop, threads
 
 
 # ---------- TRANSCRIPT HELPERS ---------- #
 
+TRANSCRIPT_LANGUAGES = ("en", "es")
+
+
+@lru_cache(maxsize=4096)
 def detect_language_safe(text):
-    """Safely detect language, defaulting to English."""
+    """
+    Safely detect language, defaulting to English. Memoized, since short
+    utterances ("okay", "yes") repeat throughout a meeting.
+    """
     load_ml_libraries()
     try:
         detected_lang = detect(text)
-        if detected_lang not in ["en", "es"]:
+        if detected_lang not in TRANSCRIPT_LANGUAGES:
             return "en"
         return detected_lang
     except Exception:
         return "en"
 
 
+def segment_language(seg):
+    """
+    Return the transcript language tag for a segment, using the language WhisperX
+    detected for its chunk and only running langdetect for untagged segments.
+    """
+    language = seg.get("language")
+    if not language:
+        return detect_language_safe(seg["text"])
+    return language if language in TRANSCRIPT_LANGUAGES else "en"
+
+
+_TRANSCRIPT_LINE = "[{lang}][{start:.2f}:{end:.2f}] Speaker {speaker}: {text}".format
+
+
 def generate_conversation_transcript(segments):
     """
     Generate user-friendly conversation transcript.
@@ -449,43 +737,37 @@ def generate_conversation_transcript(segments):
     if not segments:
         return "No conversation detected."
 
-    segments.sort(key=lambda x: x["start"])
-
-    speaker_map = {}
-    for seg in segments:
-        speaker = seg.get("speaker", "UNKNOWN")
-        if speaker not in speaker_map:
-            speaker_map[speaker] = len(speaker_map) + 1
-
-    lines = []
-    for seg in segments:
-        language = detect_language_safe(seg["text"])
-        speaker = seg.get("speaker", "UNKNOWN")
-        speaker_num = speaker_map.get(speaker, "?")
-        start = f"{seg['start']:.2f}"
-        end = f"{seg['end']:.2f}"
-        lines.append(f"[{language}][{start}:{end}] Speaker {speaker_num}: {seg['text']}")
-
-    return "\n\n".join(lines)
+    # Sort a copy so the caller's list is left untouched
+    segments = sorted(segments, key=itemgetter("start"))
+
+    # Number speakers in order of first appearance
+    labels = [seg.get("speaker", "UNKNOWN") for seg in segments]
+    speaker_map = {label: n for n, label in enumerate(dict.fromkeys(labels), 1)}
+
+    # join() materializes its argument anyway, so a list is cheaper than a generator
+    return "\n\n".join([
+        _TRANSCRIPT_LINE(
+            lang=segment_language(seg),
+            start=seg["start"],
+            end=seg["end"],
+            speaker=speaker_map[label],
+            text=seg["text"],
+        )
+        for seg, label in zip(segments, labels)
+    ])
 
 
 # ---------- GEMINI: MINUTES GENERATION ---------- #
 
-def generate_minutes_from_gemini(transcript_text: str, gemini_api_key: str) -> str:
-    """
-    Generate meeting minutes using Google Gemini API.
-    """
-    load_ml_libraries()
-    try:
-        genai.configure(api_key=gemini_api_key)
-        model = genai.GenerativeModel('gemini-2.5-flash')
-        
-        prompt = f"""You are an expert assistant that creates professional, comprehensive meeting minutes from conversation transcripts.
+# The transcript is spliced in between these, so the prompt isn't re-formatted per call
+_PROMPT_PREFIX = """You are an expert assistant that creates professional, comprehensive meeting minutes from conversation transcripts.
 
 Analyze the following meeting transcript and generate detailed, well-structured minutes:
 
 TRANSCRIPT:
-{transcript_text}
+"""
+
+_PROMPT_SUFFIX = """
 
 Please create professional meeting minutes with the following sections:
 
@@ -529,32 +811,133 @@ Please create professional meeting minutes with the following sections:
 
 Please format the minutes professionally with clear headings, bullet points where appropriate, and concise but comprehensive summaries. If any section has no relevant information from the transcript, note it as "Not discussed" or "Not specified"."""
 
-        response = model.generate_content(prompt)
+
+def generate_minutes_from_gemini(transcript_text: str, gemini_api_key: str, out):
+    """
+    Generate meeting minutes using Google Gemini API, streaming them into the
+    text file `out` as they arrive. Errors are written to the file too.
+    """
+    load_ml_libraries()
+    try:
+        genai.configure(api_key=gemini_api_key)
+        model = genai.GenerativeModel('gemini-2.5-flash')
         
-        if response and response.text:
-            return response.text
-        else:
-            return "Error: Gemini API returned an empty response."
+        prompt = "".join((_PROMPT_PREFIX, transcript_text, _PROMPT_SUFFIX))
+
+        wrote_any = False
+        for chunk in model.generate_content(prompt, stream=True):
+            if chunk.parts:
+                out.write(chunk.text)
+                wrote_any = True
+
+        if not wrote_any:
+            out.write("Error: Gemini API returned an empty response.")
             
     except Exception as e:
         print(f"Error calling Gemini API: {e}")
-        return f"Error generating minutes with Gemini API: {str(e)}\n\nPlease verify your API key is valid and has sufficient quota."
+        out.write(f"Error generating minutes with Gemini API: {str(e)}\n\nPlease verify your API key is valid and has sufficient quota.")
 
 
 # ---------- PROGRESS UPDATE HELPER ---------- #
 
+FINISHED_STATUSES = ("completed", "error", "cancelled")
+
+# Per-job version counters so status streams can sleep until something changes.
+# A finished job keeps its last version as a tombstone so a stream that read the
+# version just before the final update still wakes; the oldest are dropped.
+_job_updates = Condition()
+_job_versions = {}
+_finished_versions = {}  # job ids with a final version, oldest first
+FINISHED_VERSIONS_KEPT = 1000
+
+
+# /api/queue-status is polled by every open page, so each process caches the
+# payload. Local job changes invalidate it; the TTL bounds how stale it can get
+# when the change happened in another gunicorn worker.
+QUEUE_STATUS_TTL_SECONDS = 2
+_status_cache = {"version": 0, "built_version": -1, "built_at": 0.0, "payload": None}
+_status_cache_lock = Lock()
+
+
+def invalidate_queue_status():
+    """Make the next /api/queue-status request rebuild its payload."""
+    with _status_cache_lock:
+        _status_cache["version"] += 1
+
+
+def notify_job_update(job_id: str, finished: bool = False):
+    """Wake any status streams waiting on this job."""
+    invalidate_queue_status()
+    with _job_updates:
+        _job_versions[job_id] = _job_versions.get(job_id, 0) + 1
+        if finished and job_id not in _finished_versions:
+            _finished_versions[job_id] = None
+            if len(_finished_versions) > FINISHED_VERSIONS_KEPT:
+                oldest = next(iter(_finished_versions))
+                del _finished_versions[oldest]
+                _job_versions.pop(oldest, None)
+        _job_updates.notify_all()
+
+
+def wait_for_job_update(job_id: str, version: int, timeout: float) -> int:
+    """Block until the job's version differs from `version` or timeout; return the current version."""
+    with _job_updates:
+        _job_updates.wait_for(lambda: _job_versions.get(job_id, 0) != version, timeout)
+        return _job_versions.get(job_id, 0)
+
+
+# Progress ticks arrive several times per chunk; coalesce them so each job is
+# written at most every PROGRESS_FLUSH_SECONDS. Status changes flush at once.
+PROGRESS_FLUSH_SECONDS = 0.5
+_pending_progress = {}
+_pending_lock = Lock()
+_flush_lock = Lock()  # keeps an older batch from committing after a newer one
+_flush_timer = None
+
+
 def update_job_progress(job_id: str, **kwargs):
-    """Update job progress in database."""
-    with app.app_context():
-        try:
-            job = Job.query.get(job_id)
-            if job:
-                for key, value in kwargs.items():
-                    setattr(job, key, value)
+    """Queue a job progress update; it is written to the database shortly."""
+    global _flush_timer
+    with _pending_lock:
+        _pending_progress.setdefault(job_id, {}).update(kwargs)
+        flush_now = "status" in kwargs
+        if not flush_now and _flush_timer is None:
+            _flush_timer = Timer(PROGRESS_FLUSH_SECONDS, flush_job_progress)
+            _flush_timer.daemon = True
+            _flush_timer.start()
+    if flush_now:
+        flush_job_progress()
+
+
+def flush_job_progress():
+    """
+    Write all pending progress updates, one UPDATE per job, in one commit. Only
+    running jobs are updated, so a job cancelled or deleted in the meantime,
+    possibly by another process, keeps its final status.
+    """
+    global _flush_timer
+    with _flush_lock:
+        with _pending_lock:
+            pending = dict(_pending_progress)
+            _pending_progress.clear()
+            _flush_timer = None
+        if not pending:
+            return
+        with app.app_context():
+            try:
+                for job_id, values in pending.items():
+                    db.session.execute(
+                        update(Job)
+                        .where(Job.id == job_id, Job.status == "running")
+                        .values(**values)
+                    )
                 db.session.commit()
-        except Exception as e:
-            print(f"Error updating job progress: {e}")
-            db.session.rollback()
+            except Exception as e:
+                print(f"Error updating job progress: {e}")
+                db.session.rollback()
+                return
+        for job_id, values in pending.items():
+            notify_job_update(job_id, finished=values.get("status") in FINISHED_STATUSES)
 
 
 # ---------- MAIN PIPELINE ---------- #
@@ -564,22 +947,63 @@ class JobCancelled(Exception):
     pass
 
 
+# The cancel request may be served by another gunicorn worker, so the job's
+# status is re-read from the database, at most every CANCEL_CHECK_SECONDS
+CANCEL_CHECK_SECONDS = 2
+_cancel_checked = {}  # job_id -> time.monotonic() of the last database check
+
+
 def check_cancelled(job_id):
-    """Raise JobCancelled if this job has been cancelled."""
-    if job_id in cancelled_jobs:
-        raise JobCancelled(f"Job {job_id} was cancelled by user")
+    """Raise JobCancelled if this job has been cancelled or deleted."""
+    if job_id not in cancelled_jobs:
+        now = time.monotonic()
+        if now - _cancel_checked.get(job_id, 0) < CANCEL_CHECK_SECONDS:
+            return
+        _cancel_checked[job_id] = now
+        with app.app_context():
+            status = db.session.execute(
+                select(Job.status).where(Job.id == job_id)
+            ).scalar_one_or_none()
+        if status == "running":
+            return
+        cancelled_jobs.add(job_id)
+    raise JobCancelled(f"Job {job_id} was cancelled by user")
+
+
+@contextmanager
+def reporting_job_errors(job_id: str):
+    """Record a cancellation or failure on the job instead of letting it escape the thread."""
+    try:
+        yield
+    except JobCancelled:
+        print(f"Job {job_id} was cancelled by user.", flush=True)
+        cancelled_jobs.discard(job_id)
+    except Exception as e:
+        import traceback
+        print(f"Job {job_id} failed: {e}", flush=True)
+        traceback.print_exc()
+        update_job_progress(
+            job_id,
+            status="error",
+            error=str(e),
+            finished_at=datetime.utcnow(),
+            current_stage=f"Error: {str(e)}"
+        )
+    finally:
+        _cancel_checked.pop(job_id, None)
 
 
 def run_pipeline(audio_path_original: str, output_prefix: str, job_id: str,
                  hf_token: str, gemini_api_key: str, youtube_url: str = None):
     """
-    Complete pipeline: convert, transcribe, diarize, generate minutes.
-    Updates progress in real-time. Optionally downloads from YouTube first.
+    Complete pipeline: convert, transcribe, diarize, then hand off to finish_job()
+    to generate the transcript and minutes. Updates progress in real-time.
+    Optionally downloads from YouTube first.
     """
     import sys
     print(f"Starting pipeline for job {job_id}...", flush=True)
     sys.stdout.flush()
-    try:
+    with reporting_job_errors(job_id):
         check_cancelled(job_id)
         print("Loading ML libraries...", flush=True)
         load_ml_libraries()  # Load ML libraries when processing starts
@@ -621,18 +1045,17 @@ def run_pipeline(audio_path_original: str, output_prefix: str, job_id: str,
             progress_percent=10
         )
 
-        # Load models
+        # Load models (only slow for the first job in this process)
         check_cancelled(job_id)
-        whisper_model, diarization_pipeline = load_models(hf_token)
+        whisper_model, diarization_pipeline = get_models(hf_token)
         update_job_progress(
             job_id,
-            current_stage="Splitting audio into chunks...",
+            current_stage="Preparing audio chunks...",
             progress_percent=15
         )
 
-        # Split into chunks
-        chunks = split_audio(wav_path, CHUNK_LENGTH_MS)
-        total_chunks = len(chunks)
+        # Chunks are read from the WAV as they're needed, not split to disk
+        total_chunks, chunks = iter_audio_chunks(wav_path, CHUNK_LENGTH_MS)
         update_job_progress(
             job_id,
             total_chunks=total_chunks,
@@ -640,45 +1063,117 @@ def run_pipeline(audio_path_original: str, output_prefix: str, job_id: str,
             progress_percent=20
         )
 
-        all_segments = []
-        start_time = time.time()
+        # Diarization only needs the full WAV, so run it alongside transcription
+        diarization_result = {}
+        diarize_stop = Event()
 
-        for i, chunk in enumerate(chunks):
+        def _diarize_hook(*args, **kwargs):
+            if diarize_stop.is_set():
+                raise JobCancelled(f"Diarization for job {job_id} stopped")
+            check_cancelled(job_id)
+
+        def _diarize():
+            try:
+                diarization_result["segments"] = diarize_audio(
+                    wav_path, diarization_pipeline, hook=_diarize_hook
+                )
+            except Exception as e:
+                diarization_result["error"] = e
+
+        diarize_thread = Thread(target=_diarize, daemon=True, name=f"diarize-{job_id}")
+        diarize_thread.start()
+
+        def _transcribe(item):
+            i, audio = item
             check_cancelled(job_id)
-            chunk_start = time.time()
-            
             update_job_progress(
                 job_id,
                 current_chunk=i + 1,
                 current_stage=f"Transcribing and analyzing chunk {i+1} of {total_chunks}...",
                 progress_percent=20 + int((i / total_chunks) * 60)
             )
+            label = f"chunk {i+1} of {total_chunks}"
+            return i, audio, label, transcribe_chunk(audio, whisper_model, label)
 
-            segments = process_chunk(chunk, whisper_model, diarization_pipeline)
-            
-            if segments:
-                offset = i * (CHUNK_LENGTH_MS / 1000)
-                for seg in segments:
-                    seg["start"] += offset
-                    seg["end"] += offset
-                all_segments.extend(segments)
-
-            # Estimate time remaining
-            elapsed = time.time() - start_time
-            avg_time_per_chunk = elapsed / (i + 1)
-            remaining_chunks = total_chunks - (i + 1)
-            estimated_remaining = int(avg_time_per_chunk * remaining_chunks)
-            
-            update_job_progress(
-                job_id,
-                estimated_time_remaining=estimated_remaining
-            )
+        def _align(item):
+            i, audio, label, result = item
+            return i, align_chunk(audio, result, label)
+
+        all_segments = []
+        start_time = time.time()
+        results, stop, stage_threads = start_stage_pipeline(
+            enumerate(chunks), [_transcribe, _align], name=f"job-{job_id}"
+        )
+        try:
+            while True:
+                item = results.get()
+                if item is _STAGE_DONE:
+                    break
+                if isinstance(item, BaseException):
+                    raise item
+                i, segments = item
+
+                if segments:
+                    offset = i * (CHUNK_LENGTH_MS / 1000)
+                    for seg in segments:
+                        seg["start"] += offset
+                        seg["end"] += offset
+                    all_segments.extend(segments)
+
+                # Estimate time remaining
+                elapsed = time.time() - start_time
+                avg_time_per_chunk = elapsed / (i + 1)
+                remaining_chunks = total_chunks - (i + 1)
+                estimated_remaining = int(avg_time_per_chunk * remaining_chunks)
+
+                update_job_progress(
+                    job_id,
+                    estimated_time_remaining=estimated_remaining
+                )
+                check_cancelled(job_id)
+
+            # Speaker labels come from the whole-recording diarization run;
+            # with no segments to label it is stopped below instead
+            check_cancelled(job_id)
+            if all_segments:
+                update_job_progress(
+                    job_id,
+                    current_stage="Identifying speakers...",
+                    progress_percent=80
+                )
+                diarize_thread.join()
+                check_cancelled(job_id)
+                if "error" in diarization_result:
+                    print(f"Diarization error for {wav_path}: {diarization_result['error']}")
+                elif diarization_result.get("segments"):
+                    assign_speakers(all_segments, diarization_result["segments"])
+                else:
+                    print("No diarization segments found")
+        finally:
+            # Wait for every thread still using a model, so a cancelled or
+            # failed job is fully stopped before the worker claims the next one
+            stop.set()
+            diarize_stop.set()
+            for thread in (*stage_threads, diarize_thread):
+                thread.join()
+
+        # The GPU stages are done; hand cached blocks back so other worker
+        # processes can use them. Only once per job -- it syncs the device.
+        if CUDA_AVAILABLE:
+            torch.cuda.empty_cache()
+
+        # Transcript + Gemini minutes don't need the GPU; hand them off so the
+        # queue worker can start the next job while this one waits on the API
+        check_cancelled(job_id)
+        minutes_executor.submit(finish_job, job_id, output_prefix, all_segments, gemini_api_key)
 
-            if torch.cuda.is_available():
-                torch.cuda.empty_cache()
-                gc.collect()
 
-        # Generate outputs
+def finish_job(job_id: str, output_prefix: str, all_segments: list, gemini_api_key: str):
+    """
+    Write the conversation transcript and meeting minutes for a job whose GPU
+    stages are done, then mark it completed. Runs on minutes_executor.
+    """
+    with reporting_job_errors(job_id):
         conversation_path = None
         minutes_path = None
 
@@ -703,10 +1198,9 @@ def run_pipeline(audio_path_original: str, output_prefix: str, job_id: str,
             )
 
             check_cancelled(job_id)
-            minutes_text = generate_minutes_from_gemini(conversation_transcript, gemini_api_key)
             minutes_path = OUTPUT_DIR / f"{output_prefix}_minutes.txt"
             with open(minutes_path, "w", encoding="utf-8") as f:
-                f.write(minutes_text)
+                generate_minutes_from_gemini(conversation_transcript, gemini_api_key, f)
 
             update_job_progress(
                 job_id,
@@ -722,21 +1216,6 @@ def run_pipeline(audio_path_original: str, output_prefix: str, job_id: str,
             estimated_time_remaining=0
         )
 
-    except JobCancelled:
-        print(f"Job {job_id} was cancelled by user.", flush=True)
-        cancelled_jobs.discard(job_id)
-    except Exception as e:
-        import traceback
-        print(f"Job {job_id} failed: {e}", flush=True)
-        traceback.print_exc()
-        update_job_progress(
-            job_id,
-            status="error",
-            error=str(e),
-            finished_at=datetime.utcnow(),
-            current_stage=f"Error: {str(e)}"
-        )
-
 
 def run_pipeline_wrapper(audio_path_original: str, output_prefix: str, job_id: str,
                          hf_token: str, gemini_api_key: str, youtube_url: str = None):
@@ -750,68 +1229,340 @@ def run_pipeline_wrapper(audio_path_original: str, output_prefix: str, job_id: s
         traceback.print_exc()
 
 
+def claim_next_job():
+    """
+    Claim the oldest queued job for this worker and return its pipeline
+    arguments, or None when nothing is queued. FOR UPDATE SKIP LOCKED keeps
+    Postgres workers off each other's rows; the conditional UPDATE is what makes
+    the claim safe on SQLite, which ignores row locks.
+    """
+    with app.app_context():
+        job = db.session.execute(
+            select(Job)
+            .where(Job.status == "queued")
+            .order_by(Job.created_at)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+        ).scalar_one_or_none()
+        if job is None:
+            db.session.rollback()
+            return None
+
+        youtube_url = None
+        if not job.upload_path and job.original_filename and is_valid_youtube_url(job.original_filename):
+            youtube_url = job.original_filename
+        has_input = youtube_url or (job.upload_path and os.path.exists(job.upload_path))
+        # Jobs queued before keys were stored on the job fall back to the owner's
+        hf_token = job.hf_token or (job.user.hf_token if job.user else None)
+        gemini_key = job.gemini_key or (job.user.gemini_key if job.user else None)
+        job_args = {
+            'job_id': job.id,
+            'audio_path': job.upload_path,
+            'youtube_url': youtube_url,
+            'output_prefix': f"job_{job.id}",
+            'hf_token': hf_token,
+            'gemini_api_key': gemini_key,
+        }
+
+        if hf_token and gemini_key and has_input:
+            now = datetime.utcnow()
+            values = {
+                "status": "running",
+                "started_at": now,
+                "worker_id": worker_id(),
+                "heartbeat_at": now,
+            }
+        else:
+            values = {
+                "status": "error",
+                "error": "Job input or API keys are missing. Please re-upload.",
+                "finished_at": datetime.utcnow(),
+            }
+        claimed = db.session.execute(
+            update(Job)
+            .where(Job.id == job.id, Job.status == "queued")
+            .values(hf_token=None, gemini_key=None, **values)
+        ).rowcount
+        db.session.commit()
+
+    if not claimed:
+        return None  # another worker got it first; look again
+    notify_job_update(job_args['job_id'], finished=values["status"] == "error")
+    if values["status"] == "error":
+        return None
+    # The job was queued when claimed, so any earlier cancellation is stale
+    cancelled_jobs.discard(job_args['job_id'])
+    _owned_jobs.add(job_args['job_id'])
+    return job_args
+
+
+def worker_id():
+    """Identify this process on this host, for Job.worker_id."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def fail_orphaned_jobs():
+    """
+    Mark running jobs whose worker stopped sending heartbeats as errors, in one
+    UPDATE. Queued jobs stay in the table and are picked up by claim_next_job().
+    """
+    now = datetime.utcnow()
+    stale = now - timedelta(seconds=JOB_HEARTBEAT_TIMEOUT_SECONDS)
+    with app.app_context():
+        failed = db.session.execute(
+            update(Job)
+            .where(
+                Job.status == "running",
+                # No heartbeat at all: running since before heartbeats existed
+                db.or_(Job.heartbeat_at.is_(None), Job.heartbeat_at < stale),
+            )
+            .values(
+                status="error",
+                error="Server restarted while job was processing. Please re-upload.",
+                finished_at=now,
+            )
+        ).rowcount
+        db.session.commit()
+    if failed:
+        print(f"Failed {failed} job(s) orphaned by a stopped worker", flush=True)
+        invalidate_queue_status()
+
+
+def job_heartbeat():
+    """Keep this process's running jobs' heartbeats fresh and fail orphaned jobs."""
+    while True:
+        try:
+            owned = set(_owned_jobs)
+            if owned:
+                with app.app_context():
+                    alive = set(db.session.execute(
+                        update(Job)
+                        .where(Job.id.in_(owned), Job.status == "running",
+                               Job.worker_id == worker_id())
+                        .values(heartbeat_at=datetime.utcnow())
+                        .returning(Job.id)
+                    ).scalars())
+                    db.session.commit()
+                # Finished, cancelled or deleted jobs need no more heartbeats
+                _owned_jobs.difference_update(owned - alive)
+            fail_orphaned_jobs()
+        except Exception as e:
+            print(f"[Queue Worker] Heartbeat error: {e}", flush=True)
+        time.sleep(JOB_HEARTBEAT_SECONDS)
+
+
+def wake_queue_worker():
+    """Tell this process's worker a job was just queued."""
+    invalidate_queue_status()
+    _job_available.set()
+
+
 def queue_worker():
-    """Process jobs one at a time from the queue."""
+    """Claim and process queued jobs one at a time."""
+    if PRELOAD_WHISPER_MODEL:
+        # Load the weights before the first job arrives instead of during it
+        try:
+            get_whisper_model()
+        except Exception as e:
+            print(f"[Queue Worker] Could not preload WhisperX: {e}", flush=True)
     while True:
-        job_args = job_queue.get()
+        try:
+            job_args = claim_next_job()
+        except Exception as e:
+            print(f"[Queue Worker] Error claiming job: {e}", flush=True)
+            job_args = None
         if job_args is None:
+            _job_available.wait(QUEUE_POLL_SECONDS)
+            _job_available.clear()
             continue
         job_id = job_args['job_id']
-        if job_id in cancelled_jobs:
-            print(f"[Queue Worker] Skipping cancelled job {job_id}", flush=True)
-            cancelled_jobs.discard(job_id)
-            job_queue.task_done()
-            continue
         print(f"[Queue Worker] Starting job {job_id}", flush=True)
         run_pipeline_wrapper(
             job_args.get('audio_path'), job_args['output_prefix'],
             job_id, job_args['hf_token'], job_args['gemini_api_key'],
             youtube_url=job_args.get('youtube_url'),
         )
-        print(f"[Queue Worker] Finished job {job_id}", flush=True)
-        job_queue.task_done()
+        print(f"[Queue Worker] Finished GPU stages for job {job_id}", flush=True)
 
 
 # ---------- CLEANUP TASK ---------- #
 
+# Delete failures are logged through a queue so the cleanup loops (often on
+# request threads) never block writing to stderr
+cleanup_log = logging.getLogger("transcript.cleanup")
+cleanup_log.setLevel(logging.INFO)
+cleanup_log.propagate = False
+_cleanup_log_queue = queue.Queue(-1)
+_cleanup_log_handler = logging.StreamHandler()
+_cleanup_log_handler.setFormatter(logging.Formatter("%(levelname)s %(name)s: %(message)s"))
+_cleanup_log_listener = QueueListener(_cleanup_log_queue, _cleanup_log_handler)
+_cleanup_log_started = False
+_cleanup_log_start_lock = Lock()
+
+
+class _LazyQueueHandler(QueueHandler):
+    """Queue records for the listener, starting its thread on the first one."""
+    def emit(self, record):
+        _start_cleanup_log_listener()
+        super().emit(record)
+
+
+def _start_cleanup_log_listener():
+    """Start the listener thread once, stopping it (and flushing the queue) at exit."""
+    global _cleanup_log_started
+    with _cleanup_log_start_lock:
+        if _cleanup_log_started:
+            return
+        _cleanup_log_listener.start()
+        atexit.register(_cleanup_log_listener.stop)
+        _cleanup_log_started = True
+
+
+cleanup_log.addHandler(_LazyQueueHandler(_cleanup_log_queue))
+
+
+def _safe_unlink(path):
+    """Remove a file if it exists, logging (not raising) any failure."""
+    try:
+        Path(path).unlink(missing_ok=True)
+    except OSError as e:
+        cleanup_log.warning("Error deleting %s: %s", path, e)
+
+
+def _remove_files(paths):
+    """
+    Delete files with as few `rm -f` execs as possible, logging (not raising)
+    failures. Missing files and empty entries are ignored.
+    """
+    paths = [os.fspath(p) for p in paths if p]
+    if not paths:
+        return
+    if os.name == "nt":
+        for path in paths:
+            _safe_unlink(path)
+        return
+
+    # ARG_MAX also has to hold the environment, so stay well below it
+    limit = os.sysconf("SC_ARG_MAX") // 4
+    batches, batch, size = [], [], 0
+    for path in paths:
+        n = len(os.fsencode(path)) + 1
+        if batch and size + n > limit:
+            batches.append(batch)
+            batch, size = [], 0
+        batch.append(path)
+        size += n
+    batches.append(batch)
+
+    for batch in batches:
+        try:
+            result = subprocess.run(
+                ["rm", "-f", "--", *batch],
+                stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True,
+            )
+        except OSError as e:
+            # No usable rm (e.g. a slim image): delete the batch one by one
+            cleanup_log.warning("rm unavailable (%s), deleting files individually", e)
+            for path in batch:
+                _safe_unlink(path)
+            continue
+        if result.returncode != 0:
+            cleanup_log.warning("Error deleting files: %s", result.stderr.strip())
+
+
+def _safe_rmtree(path):
+    """
+    Remove a directory tree, logging (not raising) any failure. Uses the
+    platform's rm/rd so the tree walk runs in C, and _fast_rmtree() when that
+    command isn't available.
+    """
+    if os.name == "nt":
+        cmd = ["cmd", "/c", "rd", "/s", "/q", str(path)]
+    else:
+        cmd = ["rm", "-rf", "--", str(path)]
+    try:
+        try:
+            result = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+        except FileNotFoundError:
+            _fast_rmtree(path)
+            return
+        if result.returncode != 0 and os.path.exists(path):
+            cleanup_log.warning("Error deleting chunk dir %s: %s", path, result.stderr.strip())
+    except Exception as e:
+        cleanup_log.warning("Error deleting chunk dir %s: %s", path, e)
+
+
+def _fast_rmtree(root):
+    """
+    Delete a directory tree with os.scandir, using the entry type readdir already
+    returned instead of a stat per entry. Iterative, so deep trees can't recurse
+    too far; symlinks are unlinked, never followed.
+    """
+    # Directories are removed after their contents, so keep them in visit order
+    # and rmdir them in reverse at the end
+    dirs = [os.fspath(root)]
+    i = 0
+    while i < len(dirs):
+        with os.scandir(dirs[i]) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    dirs.append(entry.path)
+                else:
+                    os.unlink(entry.path)
+        i += 1
+    for d in reversed(dirs):
+        os.rmdir(d)
+
+
+def _purge_job_files(*jobs):
+    """
+    Delete everything on disk for the given jobs, each an (upload_path,
+    conversation_path, minutes_path) tuple: those files, the converted WAV and
+    any legacy chunk directory. All files go out in as few rm calls as possible.
+    """
+    files = []
+    for upload_path, conversation_path, minutes_path in jobs:
+        files += [upload_path, conversation_path, minutes_path]
+        if upload_path:
+            stem = Path(upload_path).stem
+            files.append(OUTPUT_DIR / (stem + "_converted.wav"))
+            chunk_dir = CHUNKS_DIR / stem
+            if chunk_dir.exists():
+                _safe_rmtree(chunk_dir)
+    _remove_files(files)
+
+
+def _remove_stale_uploads():
+    """Delete spooled uploads left behind by a worker killed mid-upload."""
+    cutoff = time.time() - STALE_UPLOAD_SECONDS
+    with os.scandir(UPLOAD_DIR) as entries:
+        stale = [
+            entry.path for entry in entries
+            if entry.name.startswith(UPLOAD_SPOOL_PREFIX)
+            and entry.is_file(follow_symlinks=False)
+            and entry.stat(follow_symlinks=False).st_mtime < cutoff
+        ]
+    _remove_files(stale)
+    if stale:
+        print(f"Removed {len(stale)} abandoned uploads")
+
+
 def cleanup_old_files():
     """Delete files older than 30 days."""
-    import shutil
     try:
         cutoff_date = datetime.utcnow() - timedelta(days=30)
-        old_jobs = Job.query.filter(Job.created_at < cutoff_date).all()
-
-        for job in old_jobs:
-            # Delete upload, conversation, and minutes files
-            for path in [job.upload_path, job.conversation_path, job.minutes_path]:
-                if path and os.path.exists(path):
-                    try:
-                        os.remove(path)
-                    except Exception as e:
-                        print(f"Error deleting {path}: {e}")
-
-            # Delete converted WAV
-            if job.upload_path:
-                converted_wav = OUTPUT_DIR / (Path(job.upload_path).stem + "_converted.wav")
-                if converted_wav.exists():
-                    try:
-                        os.remove(converted_wav)
-                    except Exception as e:
-                        print(f"Error deleting {converted_wav}: {e}")
-
-            # Delete chunk directory
-            if job.upload_path:
-                chunk_dir = CHUNKS_DIR / Path(job.upload_path).stem
-                if chunk_dir.exists():
-                    try:
-                        shutil.rmtree(chunk_dir)
-                    except Exception as e:
-                        print(f"Error deleting chunk dir {chunk_dir}: {e}")
-
-            db.session.delete(job)
-
+        # One DELETE ... RETURNING instead of loading and deleting each row
+        rows = db.session.execute(
+            delete(Job)
+            .where(Job.created_at < cutoff_date)
+            .returning(Job.upload_path, Job.conversation_path, Job.minutes_path)
+            .execution_options(synchronize_session=False)
+        ).all()
         db.session.commit()
-        print(f"Cleaned up {len(old_jobs)} old jobs")
+
+        _purge_job_files(*rows)
+        print(f"Cleaned up {len(rows)} old jobs")
+        _remove_stale_uploads()
 
     except Exception as e:
         print(f"Error in cleanup: {e}")
@@ -832,6 +1583,11 @@ def start_cleanup_scheduler():
 
 # ---------- ROUTES ---------- #
 
+def orjson_response(payload, status=200):
+    """JSON response serialized with orjson, for the endpoints the status page polls."""
+    return app.response_class(orjson.dumps(payload), status=status, mimetype="application/json")
+
+
 @app.route("/")
 def index():
     """Home page - upload form."""
@@ -899,6 +1655,23 @@ def dashboard():
     return render_template("dashboard.html", jobs=jobs)
 
 
+def save_upload(file_storage, dest):
+    """
+    Store an uploaded file at dest. Uploads spooled by UploadRequest are linked
+    into place (the temp name is removed when the request closes), so a
+    multi-GB recording is written to disk once; anything else is copied.
+    """
+    spooled = getattr(file_storage.stream, "name", None)
+    if isinstance(spooled, str) and Path(spooled).parent == UPLOAD_DIR:
+        try:
+            file_storage.stream.flush()
+            os.link(spooled, dest)
+            return
+        except OSError:
+            pass  # e.g. no hard links on this filesystem
+    file_storage.save(dest)
+
+
 @app.route("/upload", methods=["POST"])
 def upload():
     """Handle file upload and start processing."""
@@ -925,7 +1698,7 @@ def upload():
     filename = secure_filename(audio_file.filename)
     job_id = uuid.uuid4().hex
     upload_path = UPLOAD_DIR / f"{job_id}_{filename}"
-    audio_file.save(upload_path)
+    save_upload(audio_file, upload_path)
     
     # Create job record
     job = Job(
@@ -934,21 +1707,14 @@ def upload():
         original_filename=filename,
         status="queued",
         upload_path=str(upload_path),
-        current_stage="Queued for processing..."
+        current_stage="Queued for processing...",
+        hf_token=hf_token,
+        gemini_key=gemini_key,
     )
     db.session.add(job)
     db.session.commit()
-    
-    # Enqueue for sequential processing
-    output_prefix = f"job_{job_id}"
-    job_queue.put({
-        'job_id': job_id,
-        'audio_path': str(upload_path),
-        'output_prefix': output_prefix,
-        'hf_token': hf_token,
-        'gemini_api_key': gemini_key,
-    })
-    print(f"Job {job_id} added to queue (queue size: {job_queue.qsize()})", flush=True)
+    wake_queue_worker()
+    print(f"Job {job_id} added to queue", flush=True)
     
     return jsonify({"job_id": job_id})
 
@@ -982,20 +1748,13 @@ def youtube_submit():
         user_id=current_user.id,
         original_filename=youtube_url,
         status="queued",
-        current_stage="Queued for processing..."
+        current_stage="Queued for processing...",
+        hf_token=hf_token,
+        gemini_key=gemini_key,
     )
     db.session.add(job)
     db.session.commit()
-
-    output_prefix = f"job_{job_id}"
-    job_queue.put({
-        'job_id': job_id,
-        'audio_path': None,
-        'youtube_url': youtube_url,
-        'output_prefix': output_prefix,
-        'hf_token': hf_token,
-        'gemini_api_key': gemini_key,
-    })
+    wake_queue_worker()
     print(f"YouTube job {job_id} added to queue (url: {youtube_url})", flush=True)
 
     return jsonify({"job_id": job_id})
@@ -1046,47 +1805,114 @@ def job_status_page(job_id):
 @app.route("/api/status/<job_id>")
 def job_status_api(job_id):
     """API endpoint for job status updates."""
-    job = Job.query.get(job_id)
+    job = db.session.get(Job, job_id)
     if not job:
-        return jsonify({"error": "Job not found"}), 404
+        return orjson_response({"error": "Job not found"}, 404)
     
-    return jsonify(job.to_dict())
+    return orjson_response(job.to_dict())
 
 
-@app.route("/api/queue-status")
-def queue_status_api():
-    """API endpoint for global queue status."""
-    queued_jobs = Job.query.filter_by(status="queued").order_by(Job.created_at).all()
-    running_job = Job.query.filter_by(status="running").first()
+@app.route("/api/stream/<job_id>")
+def job_status_stream(job_id):
+    """
+    Server-Sent Events stream of job status. Pushes the job's to_dict() whenever
+    it changes instead of having the page poll /api/status.
+    """
+    def generate():
+        # Each stream holds a server thread, so cap them; the page falls back
+        # to polling when it receives a "busy" event.
+        if not _sse_slots.acquire(blocking=False):
+            yield "event: busy\ndata: {}\n\n"
+            return
+        try:
+            deadline = time.monotonic() + SSE_STREAM_SECONDS
+            version = _job_versions.get(job_id, 0)
+            last_payload = None
+            while True:
+                job = db.session.get(Job, job_id)
+                payload = job.to_dict() if job else {"error": "Job not found"}
+                db.session.rollback()  # end the read transaction so the next read is fresh
+
+                if payload != last_payload:
+                    yield f"data: {orjson.dumps(payload).decode()}\n\n"
+                    last_payload = payload
+                else:
+                    yield ": keepalive\n\n"
+
+                if not job or payload["status"] in FINISHED_STATUSES or time.monotonic() >= deadline:
+                    return
+                # The job may be running in another worker process, so re-read
+                # periodically even without a local notification.
+                version = wait_for_job_update(job_id, version, SSE_POLL_SECONDS)
+        finally:
+            _sse_slots.release()
+
+    return app.response_class(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def build_queue_status() -> dict:
+    """Queue summary for /api/queue-status, from one query over active jobs."""
+    active_jobs = db.session.query(
+        Job.id, Job.original_filename, Job.status, Job.progress_percent
+    ).filter(Job.status.in_(("queued", "running"))).order_by(Job.created_at).all()
+    queued_jobs = [j for j in active_jobs if j.status == "queued"]
+    running_jobs = [
+        {
+            "id": j.id,
+            "original_filename": j.original_filename,
+            "progress_percent": j.progress_percent or 0,
+        }
+        for j in active_jobs if j.status == "running"
+    ]
+    # While one job is on the GPU, jobs it followed may still be running their
+    # minutes. Those finish on their own, so the queue waits on the job that is
+    # least far along.
+    running_job = min(running_jobs, key=itemgetter("progress_percent"), default=None)
 
     is_processing = running_job is not None
     queue_length = len(queued_jobs)
 
     # Estimate wait: remaining time on running job + queued jobs * avg duration
     estimated_wait_minutes = queue_length * AVG_JOB_DURATION_MINUTES
-    running_job_info = None
     if running_job:
-        running_job_info = {
-            "id": running_job.id,
-            "original_filename": running_job.original_filename,
-            "progress_percent": running_job.progress_percent or 0,
-        }
-        # Add remaining time for running job
-        remaining_fraction = 1 - (running_job.progress_percent or 0) / 100
+        remaining_fraction = 1 - running_job["progress_percent"] / 100
         estimated_wait_minutes += remaining_fraction * AVG_JOB_DURATION_MINUTES
 
     estimated_wait_minutes = round(estimated_wait_minutes)
 
-    return jsonify({
+    return {
         "queue_length": queue_length,
         "is_processing": is_processing,
-        "running_job": running_job_info,
+        "running_job": running_job,
+        "running_jobs": running_jobs,
         "estimated_wait_minutes": estimated_wait_minutes,
         "queued_jobs": [
             {"id": j.id, "original_filename": j.original_filename}
             for j in queued_jobs
         ],
-    })
+    }
+
+
+@app.route("/api/queue-status")
+def queue_status_api():
+    """API endpoint for global queue status."""
+    with _status_cache_lock:
+        version = _status_cache["version"]
+        payload = _status_cache["payload"]
+        fresh = (
+            payload is not None
+            and _status_cache["built_version"] == version
+            and time.monotonic() - _status_cache["built_at"] < QUEUE_STATUS_TTL_SECONDS
+        )
+    if not fresh:
+        payload = build_queue_status()
+        with _status_cache_lock:
+            _status_cache.update(payload=payload, built_version=version, built_at=time.monotonic())
+    return orjson_response(payload)
 
 
 @app.route("/download/<job_id>/<file_type>")
@@ -1100,69 +1926,77 @@ def download_file(job_id, file_type):
     if current_user.is_authenticated and job.user_id and job.user_id != current_user.id and not is_admin():
         return "Access denied", 403
     
-    if file_type == "conversation" and job.conversation_path:
-        return send_from_directory(
-            OUTPUT_DIR,
-            Path(job.conversation_path).name,
-            as_attachment=True
-        )
-    elif file_type == "minutes" and job.minutes_path:
-        return send_from_directory(
-            OUTPUT_DIR,
-            Path(job.minutes_path).name,
-            as_attachment=True
-        )
-    
-    return "File not found", 404
+    if file_type == "conversation":
+        path = job.conversation_path
+    elif file_type == "minutes":
+        path = job.minutes_path
+    else:
+        path = None
+    if not path:
+        return "File not found", 404
+
+    # send_file doesn't do send_from_directory's containment check, so only
+    # serve files that resolve to somewhere inside OUTPUT_DIR
+    file_path = (OUTPUT_DIR / Path(path).name).resolve()
+    if file_path.parent != OUTPUT_DIR.resolve() or not file_path.is_file():
+        return "File not found", 404
+
+    # Behind nginx (see nginx.conf), hand the transfer back to the proxy so it
+    # streams the file itself and this worker is freed immediately
+    if request.headers.get("X-Sendfile-Type") == "X-Accel-Redirect":
+        response = app.response_class(mimetype="text/plain")
+        response.headers["X-Accel-Redirect"] = f"/protected-outputs/{file_path.name}"
+        response.headers["Content-Disposition"] = f'attachment; filename="{file_path.name}"'
+        return response
+
+    # conditional=True answers Range/If-Modified-Since requests, and the file
+    # body goes out through the WSGI server's file wrapper (sendfile where available)
+    return send_file(
+        file_path,
+        as_attachment=True,
+        conditional=True,
+        etag=True,
+        last_modified=file_path.stat().st_mtime,
+    )
 
 
 @app.route("/api/delete/<job_id>", methods=["DELETE"])
 @login_required
 def delete_job(job_id):
     """Delete a job and all its associated files."""
-    import shutil
-
-    job = Job.query.get(job_id)
+    # Only the columns this route needs, not a full Job object
+    job = db.session.execute(
+        select(Job.user_id, Job.status, Job.upload_path, Job.conversation_path, Job.minutes_path)
+        .where(Job.id == job_id)
+    ).one_or_none()
     if not job:
         return jsonify({"error": "Job not found"}), 404
 
     if job.user_id != current_user.id:
         return jsonify({"error": "Access denied"}), 403
 
+    paths = (job.upload_path, job.conversation_path, job.minutes_path)
+
+    # Delete from database. Nothing else is touched until the delete has
+    # committed, so a failure leaves the job and its files as they were.
+    try:
+        db.session.execute(delete(Job).where(Job.id == job_id))
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        cleanup_log.exception("Error deleting job %s", job_id)
+        return jsonify({"error": "Could not delete job"}), 500
+    invalidate_queue_status()
+
     # Cancel if running or queued
     if job.status in ("running", "queued"):
         cancelled_jobs.add(job_id)
         print(f"Job {job_id} cancelled (was {job.status})", flush=True)
 
-    # Delete associated files
-    for path in [job.upload_path, job.conversation_path, job.minutes_path]:
-        if path and os.path.exists(path):
-            try:
-                os.remove(path)
-            except Exception as e:
-                print(f"Error deleting {path}: {e}")
-
-    # Delete chunk directory
-    if job.upload_path:
-        chunk_dir = CHUNKS_DIR / Path(job.upload_path).stem
-        if chunk_dir.exists():
-            try:
-                shutil.rmtree(chunk_dir)
-            except Exception as e:
-                print(f"Error deleting chunk dir {chunk_dir}: {e}")
-
-    # Also try the converted WAV in outputs
-    if job.upload_path:
-        converted_wav = OUTPUT_DIR / (Path(job.upload_path).stem + "_converted.wav")
-        if converted_wav.exists():
-            try:
-                os.remove(converted_wav)
-            except Exception as e:
-                print(f"Error deleting {converted_wav}: {e}")
-
-    # Delete from database
-    db.session.delete(job)
-    db.session.commit()
+    # Delete associated files in the background; the job is already gone.
+    # Jobs that never got a file (e.g. a failed YouTube download) skip this.
+    if any(paths):
+        _cleanup_pool.submit(_purge_job_files, paths)
 
     return jsonify({"status": "deleted"})
 
@@ -1186,6 +2020,7 @@ def cancel_job(job_id):
     job.current_stage = "Cancelled by user"
     job.finished_at = datetime.utcnow()
     db.session.commit()
+    notify_job_update(job_id, finished=True)
     print(f"Job {job_id} cancelled by user", flush=True)
 
     return jsonify({"status": "cancelled"})
@@ -1228,28 +2063,16 @@ def retry_job(job_id):
     db.session.commit()
 
     # Clean up old output files
-    for path in [job.conversation_path, job.minutes_path]:
-        if path and os.path.exists(path):
-            try:
-                os.remove(path)
-            except Exception:
-                pass
-
-    if job.upload_path:
-        chunk_dir = CHUNKS_DIR / Path(job.upload_path).stem
-        if chunk_dir.exists():
-            import shutil
-            try:
-                shutil.rmtree(chunk_dir)
-            except Exception:
-                pass
+    stem = Path(job.upload_path).stem
+    _remove_files([
+        job.conversation_path,
+        job.minutes_path,
+        OUTPUT_DIR / (stem + "_converted.wav"),
+    ])
 
-        converted_wav = OUTPUT_DIR / (Path(job.upload_path).stem + "_converted.wav")
-        if converted_wav.exists():
-            try:
-                os.remove(converted_wav)
-            except Exception:
-                pass
+    chunk_dir = CHUNKS_DIR / stem
+    if chunk_dir.exists():
+        _safe_rmtree(chunk_dir)
 
     # Reset job state
     job.status = "queued"
@@ -1263,17 +2086,10 @@ def retry_job(job_id):
     job.finished_at = None
     job.conversation_path = None
     job.minutes_path = None
+    job.hf_token = hf_token
+    job.gemini_key = gemini_key
     db.session.commit()
-
-    # Re-queue
-    output_prefix = f"job_{job_id}"
-    job_queue.put({
-        'job_id': job_id,
-        'audio_path': job.upload_path,
-        'output_prefix': output_prefix,
-        'hf_token': hf_token,
-        'gemini_api_key': gemini_key,
-    })
+    wake_queue_worker()
     print(f"Job {job_id} retried and re-queued", flush=True)
 
     return jsonify({"status": "queued"})
@@ -1314,40 +2130,29 @@ def admin_dashboard():
 @admin_required
 def admin_delete_job(job_id):
     """Admin: delete any job and its associated files."""
-    import shutil
-
-    job = Job.query.get(job_id)
+    job = db.session.execute(
+        select(Job.status, Job.upload_path, Job.conversation_path, Job.minutes_path)
+        .where(Job.id == job_id)
+    ).one_or_none()
     if not job:
         return jsonify({"error": "Job not found"}), 404
 
-    if job.status in ("running", "queued"):
-        cancelled_jobs.add(job_id)
-
-    for path in [job.upload_path, job.conversation_path, job.minutes_path]:
-        if path and os.path.exists(path):
-            try:
-                os.remove(path)
-            except Exception as e:
-                print(f"Error deleting {path}: {e}")
+    paths = (job.upload_path, job.conversation_path, job.minutes_path)
 
-    if job.upload_path:
-        chunk_dir = CHUNKS_DIR / Path(job.upload_path).stem
-        if chunk_dir.exists():
-            try:
-                shutil.rmtree(chunk_dir)
-            except Exception as e:
-                print(f"Error deleting chunk dir {chunk_dir}: {e}")
+    try:
+        db.session.execute(delete(Job).where(Job.id == job_id))
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        cleanup_log.exception("Error deleting job %s", job_id)
+        return jsonify({"error": "Could not delete job"}), 500
+    invalidate_queue_status()
 
-    if job.upload_path:
-        converted_wav = OUTPUT_DIR / (Path(job.upload_path).stem + "_converted.wav")
-        if converted_wav.exists():
-            try:
-                os.remove(converted_wav)
-            except Exception as e:
-                print(f"Error deleting {converted_wav}: {e}")
+    if job.status in ("running", "queued"):
+        cancelled_jobs.add(job_id)
 
-    db.session.delete(job)
-    db.session.commit()
+    if any(paths):
+        _cleanup_pool.submit(_purge_job_files, paths)
 
     return jsonify({"status": "deleted"})
 
@@ -1356,8 +2161,6 @@ def admin_delete_job(job_id):
 @admin_required
 def admin_delete_user(user_id):
     """Admin: delete a user and all their jobs."""
-    import shutil
-
     user = User.query.get(user_id)
     if not user:
         return jsonify({"error": "User not found"}), 404
@@ -1365,35 +2168,31 @@ def admin_delete_user(user_id):
     if user.id == current_user.id:
         return jsonify({"error": "Cannot delete yourself"}), 400
 
-    for job in user.jobs:
+    # Only the columns needed for cleanup; loading the Job objects would make
+    # the cascade on User.jobs delete them one row at a time
+    jobs = db.session.query(
+        Job.id, Job.status, Job.upload_path, Job.conversation_path, Job.minutes_path
+    ).filter(Job.user_id == user.id).all()
+
+    # One DELETE for all of the user's jobs, then the user, in one transaction
+    try:
+        db.session.execute(delete(Job).where(Job.user_id == user_id))
+        db.session.execute(delete(User).where(User.id == user_id))
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        cleanup_log.exception("Error deleting user %s", user_id)
+        return jsonify({"error": "Could not delete user"}), 500
+    invalidate_queue_status()
+
+    for job in jobs:
         if job.status in ("running", "queued"):
             cancelled_jobs.add(job.id)
 
-        for path in [job.upload_path, job.conversation_path, job.minutes_path]:
-            if path and os.path.exists(path):
-                try:
-                    os.remove(path)
-                except Exception as e:
-                    print(f"Error deleting {path}: {e}")
-
-        if job.upload_path:
-            chunk_dir = CHUNKS_DIR / Path(job.upload_path).stem
-            if chunk_dir.exists():
-                try:
-                    shutil.rmtree(chunk_dir)
-                except Exception as e:
-                    print(f"Error deleting chunk dir {chunk_dir}: {e}")
-
-        if job.upload_path:
-            converted_wav = OUTPUT_DIR / (Path(job.upload_path).stem + "_converted.wav")
-            if converted_wav.exists():
-                try:
-                    os.remove(converted_wav)
-                except Exception as e:
-                    print(f"Error deleting {converted_wav}: {e}")
-
-    db.session.delete(user)
-    db.session.commit()
+    paths = [(job.upload_path, job.conversation_path, job.minutes_path) for job in jobs]
+    paths = [p for p in paths if any(p)]
+    if paths:
+        _cleanup_pool.submit(_purge_job_files, *paths)
 
     return jsonify({"status": "deleted"})
 
@@ -1407,8 +2206,17 @@ def trigger_cleanup():
 
 # ---------- DATABASE INITIALIZATION ---------- #
 
+@app.cli.command("init-db")
+def init_db_command():
+    """Create and migrate the database tables."""
+    init_db()
+
+
 def init_db():
-    """Initialize database tables."""
+    """
+    Initialize database tables. Run once before the server starts (gunicorn's
+    on_starting hook, or `flask --app app init-db`), never from every worker.
+    """
     with app.app_context():
         db.create_all()
         # Migrate: add hf_token and gemini_key columns to users table if missing
@@ -1420,33 +2228,92 @@ def init_db():
             if "gemini_key" not in columns:
                 conn.execute(text("ALTER TABLE users ADD COLUMN gemini_key VARCHAR(500)"))
                 conn.commit()
+            columns = [row[1] for row in conn.execute(text("PRAGMA table_info(jobs)"))]
+            if "hf_token" not in columns:
+                conn.execute(text("ALTER TABLE jobs ADD COLUMN hf_token VARCHAR(500)"))
+                conn.commit()
+            if "gemini_key" not in columns:
+                conn.execute(text("ALTER TABLE jobs ADD COLUMN gemini_key VARCHAR(500)"))
+                conn.commit()
+            if "worker_id" not in columns:
+                conn.execute(text("ALTER TABLE jobs ADD COLUMN worker_id VARCHAR(300)"))
+                conn.commit()
+            if "heartbeat_at" not in columns:
+                conn.execute(text("ALTER TABLE jobs ADD COLUMN heartbeat_at DATETIME"))
+                conn.commit()
+            # create_all() doesn't add indexes to tables that already exist
+            conn.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_jobs_status_created_at ON jobs (status, created_at)"
+            ))
+            conn.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_jobs_user_created ON jobs (user_id, created_at DESC)"
+            ))
+            conn.commit()
         print("Database tables created successfully")
 
 
 # ---------- MAIN ---------- #
 
 def start_queue_worker():
-    """Start worker thread and handle orphaned jobs from previous crashes."""
-    with app.app_context():
-        # Mark stuck "running" jobs as error
-        for job in Job.query.filter_by(status="running").all():
-            job.status = "error"
-            job.error = "Server restarted while job was processing. Please re-upload."
-            job.finished_at = datetime.utcnow()
-        # Mark orphaned "queued" jobs as error (we lost their API keys)
-        for job in Job.query.filter_by(status="queued").all():
-            job.status = "error"
-            job.error = "Server restarted while job was queued. Please re-upload."
-            job.finished_at = datetime.utcnow()
-        db.session.commit()
-
+    """
+    Start the worker thread, and the heartbeat thread that also fails jobs
+    orphaned by a crashed worker. Jobs with a live worker in another process
+    keep heartbeating, so it is safe for every process to run this.
+    """
+    Thread(target=job_heartbeat, daemon=True, name="job-heartbeat").start()
     worker = Thread(target=queue_worker, daemon=True, name="job-queue-worker")
     worker.start()
 
-init_db()
-start_queue_worker()
-start_cleanup_scheduler()
+
+_queue_lock_file = None
+
+
+def start_queue_worker_when_elected():
+    """
+    Wait (in a background thread) to hold QUEUE_LOCK_PATH, then start the queue
+    worker and cleanup scheduler. The OS drops the lock when the holder exits,
+    so a replacement gunicorn worker takes over after a crash.
+    """
+    def _elect():
+        global _queue_lock_file
+        try:
+            import fcntl
+        except ImportError:
+            fcntl = None  # Windows: development server, a single process
+        if fcntl is not None:
+            _queue_lock_file = open(QUEUE_LOCK_PATH, "a")
+            fcntl.flock(_queue_lock_file, fcntl.LOCK_EX)
+        print(f"[Queue Worker] Running in process {os.getpid()}", flush=True)
+        start_queue_worker()
+        start_cleanup_scheduler()
+
+    Thread(target=_elect, daemon=True, name="queue-worker-election").start()
+
+
+_app_started = False
+
+
+def create_app():
+    """
+    Start this process's background threads and return the app. Gunicorn calls
+    this once per worker ("app:create_app()"), so importing app.py has no side
+    effects. The database must already be initialized; see init_db().
+
+    One process per host runs the job queue worker and cleanup scheduler (see
+    QUEUE_LOCK_PATH). QUEUE_WORKER=0 keeps this process out of that election,
+    for processes that should only serve requests.
+    """
+    global _app_started
+    if _app_started:
+        return app
+    _app_started = True
+
+    if os.environ.get("QUEUE_WORKER", "1") == "1":
+        start_queue_worker_when_elected()
+    return app
+
 
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=5000, debug=False, threaded=True)
+    init_db()
+    create_app().run(host="0.0.0.0", port=5000, debug=False, threaded=True)
 
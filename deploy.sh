@@ -136,7 +136,7 @@ Type=simple
 User=$USER
 WorkingDirectory=$APP_DIR
 Environment="PATH=$VENV_PATH/bin"
-ExecStart=$VENV_PATH/bin/gunicorn --workers 2 --threads 2 --timeout 7200 --bind 0.0.0.0:$PORT app:app
+ExecStart=$VENV_PATH/bin/gunicorn -c gunicorn.conf.py --workers 2 --threads 8 --timeout 7200 --bind 0.0.0.0:$PORT "app:create_app()"
 Restart=always
 RestartSec=10
 
@@ -0,0 +1,14 @@
+"""
+Gunicorn settings. Start the server with:
+
+    gunicorn -c gunicorn.conf.py --workers 4 --threads 8 --timeout 7200 --bind 0.0.0.0:5000 "app:create_app()"
+"""
+import subprocess
+import sys
+
+
+def on_starting(server):
+    """Create and migrate the database once, in the master, before any worker starts."""
+    # A separate process, so the master never imports app.py and workers don't
+    # inherit its database connections
+    subprocess.run([sys.executable, "-m", "flask", "--app", "app", "init-db"], check=True)